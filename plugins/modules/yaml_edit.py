@@ -28,6 +28,9 @@ options:
           "some.nested.key": "value",
           "mylist[0]": "changed first item"
         })
+      - Prefer passing all edits for a file in a single task rather than one task
+        per key; the whole batch is applied in a single read-modify-write pass
+        and paths sharing a parent are only traversed once.
     required: true
     type: dict
   backup:
@@ -36,6 +39,16 @@ options:
     required: false
     default: false
     type: bool
+  preserve_formatting:
+    description:
+      - Whether to preserve comments, quoting, and indentation in the file by using
+        ruamel.yaml's round-trip loader.
+      - When set to C(false), the much faster C-backed safe loader is used instead.
+        Comments and custom formatting in the file are lost on write, so only disable
+        this for machine-generated files where formatting does not matter.
+    required: false
+    default: true
+    type: bool
 author:
   - Your Name <you@example.com>
 '''
@@ -62,6 +75,18 @@ EXAMPLES = r'''
       serve.vllm.vllm_args[0]: --tensor-parallel-size
       serve.vllm.vllm_args[1]: '5'
       serve.vllm.vllm_args[2]: --api-key
+
+# Batch every edit for a file into one task; this is much cheaper than
+# invoking the module once per key.
+- name: Apply all config changes in a single pass
+  yaml_edit:
+    path: /etc/myapp/config.yaml
+    changes:
+      serve.host: 0.0.0.0
+      serve.port: 8000
+      serve.vllm.vllm_args[0]: --tensor-parallel-size
+      serve.vllm.vllm_args[1]: '5'
+      logging.level: info
 '''
 
 RETURN = r'''
@@ -75,8 +100,11 @@ msg:
   returned: always
 '''
 
+import io
 import os
-import copy
+import re
+import functools
+import tempfile
 from ansible.module_utils.basic import AnsibleModule
 
 # Attempt to load ruamel.yaml
@@ -86,124 +114,329 @@ try:
 except ImportError:
     HAS_RUAMEL = False
 
-
+# Shared YAML instances (one per formatting mode) and parsed file trees.
+# Ansible usually runs each task in a fresh process, but when the module is
+# invoked repeatedly in one process (action plugins, tests) this amortizes
+# parser construction and file parsing. The parse cache holds one entry per
+# path — (stat signature, tree) — and the entry is dropped whenever the module
+# itself rewrites the file: mtime_ns granularity is a clock tick and value
+# edits often keep the size, so a stat signature alone cannot be trusted to
+# change across our own writes.
+_YAML_CACHE = {}
+_PARSE_CACHE = {}
+
+# Fingerprints of invocations that resulted in no change: path -> set of
+# (stat signature, changes repr). A hit means the same edits were already
+# verified as no-ops against this exact file state, so the module can exit
+# without even opening the file. Like the parse cache, a path's fingerprints
+# are purged after the module rewrites the file, since the stat signature
+# alone cannot be trusted to change across our own writes.
+_NOOP_CACHE = {}
+
+
+def get_yaml(preserve_formatting):
+    """
+    Return a lazily constructed, shared YAML instance for the given mode.
+    """
+    yaml = _YAML_CACHE.get(preserve_formatting)
+    if yaml is None:
+        if preserve_formatting:
+            yaml = YAML()
+            yaml.preserve_quotes = True
+            yaml.explicit_start = False
+            yaml.indent(sequence=4, offset=2)
+        else:
+            # The safe loader dispatches to the libyaml C extension when available,
+            # which parses roughly an order of magnitude faster than the pure-Python
+            # round-trip loader. It does not support preserve_quotes/indent, and
+            # comments in the file are discarded on write.
+            yaml = YAML(typ="safe", pure=False)
+            yaml.default_flow_style = False
+        _YAML_CACHE[preserve_formatting] = yaml
+    return yaml
+
+
+# Tokenizer for key paths: either a bare run of characters between dots, or a
+# bracketed segment (quoted with "..."/'...', or bare, in which case integers
+# become list indices). Compiled once so scanning stays in the re C engine;
+# each segment is produced as a single match-group slice, with no
+# per-character Python loop or incremental string accumulation anywhere.
+_KEY_RE = re.compile(
+    r'(?:\.?([^.\[\]]+))'    # dotted segment
+    r'|\[\s*(?:"([^"]*)"'    # ["quoted.key"]
+    r"|'([^']*)'"            # ['quoted.key']
+    r'|([^\]]*))\s*\]'       # [bare] -> list index if it parses as an int
+)
+
+
+@functools.lru_cache(maxsize=2048)
 def parse_key_path(key_path):
     """
-    Parse a key path string into a list of segments.
+    Parse a key path string into a tuple of segments.
     Supports:
       - Dot notation: parent.child
       - Bracket notation: parent[0], parent["some.key"]
-    Returns a list of segments, where integers are list indices and strings are dict keys.
+    Returns a tuple of segments, where integers are list indices and strings are dict keys.
+    Quoted bracket content is always treated as a dict key, even if numeric.
+    Results are memoized since the same key paths recur across changes and
+    invocations.
 
     Example:
-      "serve.vllm.vllm_args[1]" -> ["serve", "vllm", "vllm_args", 1]
-      "parent.child[\"key\"]"   -> ["parent", "child", "key"]
+      "serve.vllm.vllm_args[1]" -> ("serve", "vllm", "vllm_args", 1)
+      "parent.child[\"key\"]"   -> ("parent", "child", "key")
     """
     segments = []
-    current_segment = ""
-    in_brackets = False
-    i = 0
-
-    while i < len(key_path):
-        char = key_path[i]
-
-        if char == '.' and not in_brackets:
-            # Dot outside brackets => split
-            if current_segment:
-                segments.append(current_segment)
-            current_segment = ""
-        elif char == '[':
-            # Bracket starts => add current segment if any, parse bracket content separately
-            if current_segment:
-                segments.append(current_segment)
-            current_segment = ""
-            in_brackets = True
-        elif char == ']':
-            # Bracket ends
-            in_brackets = False
-            bracket_content = current_segment.strip('"').strip("'").strip()
-            # Try to interpret bracket_content as an integer
-            try:
-                bracket_index = int(bracket_content)
-                segments.append(bracket_index)
-            except ValueError:
-                # Not an integer => treat it as a string
-                segments.append(bracket_content)
-            current_segment = ""
+    for match in _KEY_RE.finditer(key_path):
+        dotted, dquoted, squoted, bare = match.groups()
+        if dotted is not None:
+            segments.append(dotted)
+        elif dquoted is not None:
+            segments.append(dquoted)
+        elif squoted is not None:
+            segments.append(squoted)
         else:
-            current_segment += char
-        i += 1
-
-    # Append leftover if any
-    if current_segment:
-        segments.append(current_segment)
-
-    return segments
+            bare = bare.strip()
+            # Validate with a cheap decimal test instead of letting int()
+            # raise and catch ValueError for every non-numeric segment.
+            digits = bare[1:] if bare.startswith('-') else bare
+            if digits.isdecimal():
+                segments.append(int(bare))
+            else:
+                segments.append(bare)
+    return tuple(segments)
 
 
 def ensure_list_size(lst, index):
     """
     Ensure 'lst' has at least 'index+1' items, padding with None if needed.
     """
-    while len(lst) <= index:
-        lst.append(None)
+    delta = index + 1 - len(lst)
+    if delta > 0:
+        # Single C-level bulk grow instead of a Python append loop;
+        # CommentedSeq inherits from list so this works for both.
+        lst.extend([None] * delta)
 
 
-def set_nested_value(data, key_path, value, module):
+def clone_tree(obj):
+    """
+    Cheaply clone a parsed YAML tree. Plain dicts and lists (what the safe
+    loader produces) are rebuilt with a direct recursion, immutable scalars
+    are shared; anything else — ruamel's comment-carrying node types in
+    particular — falls back to copy.deepcopy so formatting metadata survives.
     """
-    Traverse or create nested structures (dicts/lists) according to
-    the parsed path, then set the final key/index to 'value'.
+    t = obj.__class__
+    if t is dict:
+        return {k: clone_tree(v) for k, v in obj.items()}
+    if t is list:
+        return [clone_tree(v) for v in obj]
+    if t is str or t is int or t is float or t is bool or obj is None:
+        return obj
+    # Only ruamel trees reach here; keep the import out of module load, which
+    # Ansible pays on every task.
+    import copy
+    return copy.deepcopy(obj)
+
+
+def descend_segment(ref, seg, module):
+    """
+    Traverse one intermediate path segment from container 'ref', creating the
+    child container (a dict by default) if it is missing, and return the child.
+
+    - int segment => list index
+    - str segment => dictionary key
+
+    The exact-class identity test is a single pointer compare and hits for
+    plain dict/list; the isinstance fallback still accepts subclasses
+    (CommentedMap/CommentedSeq).
+    """
+    t = ref.__class__
+    if isinstance(seg, int):
+        # This segment is a list index
+        if not (t is list or isinstance(ref, list)):
+            module.fail_json(msg=f"Expected a list at segment {seg}, found {t.__name__}")
+        ensure_list_size(ref, seg)
+        child = ref[seg]
+        if child is None:
+            # Initialize as a dict by default, or list, depending on your logic
+            child = {}
+            ref[seg] = child
+        return child
+    else:
+        # This segment is a dictionary key
+        if not (t is dict or isinstance(ref, dict)):
+            module.fail_json(msg=f"Expected a dict at segment '{seg}', found {t.__name__}")
+        # setdefault probes and inserts with a single hash lookup, and
+        # avoids raising/catching KeyError on the create path.
+        return ref.setdefault(seg, {})
+
+
+def assign_segment(ref, seg, value, module):
+    """
+    Set the final key/index 'seg' of container 'ref' to 'value'.
+    Returns True if the assignment actually modified 'ref' (the key was
+    missing or held a different value), False if it was already in place.
+    """
+    if isinstance(seg, int):
+        # Final segment is a list index
+        if not (ref.__class__ is list or isinstance(ref, list)):
+            module.fail_json(msg=f"Expected a list for final segment {seg}, found {type(ref).__name__}")
+        if seg >= len(ref):
+            ensure_list_size(ref, seg)
+            ref[seg] = value
+            return True
+        if ref[seg] != value:
+            ref[seg] = value
+            return True
+        return False
+    else:
+        # Final segment is a dict key
+        if not (ref.__class__ is dict or isinstance(ref, dict)):
+            module.fail_json(msg=f"Expected a dict for final segment '{seg}', found {type(ref).__name__}")
+        if seg not in ref or ref[seg] != value:
+            ref[seg] = value
+            return True
+        return False
+
+
+# Sentinel key under which a trie node stores its own (key_path, value) target;
+# it can never collide with a real segment (str or int).
+_LEAF = object()
+
+# Sentinel returned by dict.get in would_change for keys that do not exist.
+_NOT_FOUND = object()
 
-    - Dot notation => dictionary keys
-    - Bracket notation with int => list index
-    - Bracket notation with string => dictionary key
+
+def would_change(data, segments, value, module):
+    """
+    Read-only dry run of one change against 'data'. Returns True if applying
+    it would modify the tree, False if the target already holds 'value', and
+    fails with the same messages as descend_segment/assign_segment on
+    container-shape conflicts, so check mode predicts the real outcome.
+    Never creates or mutates anything: once the walk leaves the existing tree
+    the real run would be creating fresh empty dicts, which any list-index
+    segment further down would conflict with.
     """
-    segments = parse_key_path(key_path)
     ref = data
+    virtual = False  # True once past the point where containers would be created
     for seg in segments[:-1]:
         if isinstance(seg, int):
-            # This segment is a list index
-            if not isinstance(ref, list):
-                # If it's not a list, we can decide to convert or fail
-                ref_type = type(ref).__name__
-                if ref_type == 'dict' and len(ref) == 0:
-                    # Convert empty dict to list
-                    ref = []
-                else:
-                    module.fail_json(msg=f"Expected a list at segment {seg}, found {ref_type}")
-            ensure_list_size(ref, seg)
-            if ref[seg] is None:
-                # Initialize as a dict by default, or list, depending on your logic
-                ref[seg] = {}
-            ref = ref[seg]
+            if virtual:
+                module.fail_json(msg=f"Expected a list at segment {seg}, found dict")
+            if not (ref.__class__ is list or isinstance(ref, list)):
+                module.fail_json(msg=f"Expected a list at segment {seg}, found {type(ref).__name__}")
+            if seg >= len(ref):
+                # The real run pads with None and fills the slot with a dict
+                virtual = True
+                continue
+            child = ref[seg]  # may raise IndexError, like the real run
+            if child is None:
+                virtual = True
+                continue
+            ref = child
         else:
-            # This segment is a dictionary key
-            if not isinstance(ref, dict):
-                # Convert or fail
-                ref_type = type(ref).__name__
-                if ref_type == 'list' and len(ref) == 0:
-                    # Convert empty list to dict
-                    ref = {}
-                else:
-                    module.fail_json(msg=f"Expected a dict at segment '{seg}', found {ref_type}")
-            if seg not in ref:
-                ref[seg] = {}
-            ref = ref[seg]
-
-    last_seg = segments[-1]
-    if isinstance(last_seg, int):
-        # Final segment is a list index
-        if not isinstance(ref, list):
-            ref_type = type(ref).__name__
-            module.fail_json(msg=f"Expected a list for final segment {last_seg}, found {ref_type}")
-        ensure_list_size(ref, last_seg)
-        ref[last_seg] = value
+            if virtual:
+                continue
+            if not (ref.__class__ is dict or isinstance(ref, dict)):
+                module.fail_json(msg=f"Expected a dict at segment '{seg}', found {type(ref).__name__}")
+            child = ref.get(seg, _NOT_FOUND)
+            if child is _NOT_FOUND:
+                virtual = True
+                continue
+            ref = child
+
+    seg = segments[-1]
+    if isinstance(seg, int):
+        if virtual:
+            module.fail_json(msg=f"Expected a list for final segment {seg}, found dict")
+        if not (ref.__class__ is list or isinstance(ref, list)):
+            module.fail_json(msg=f"Expected a list for final segment {seg}, found {type(ref).__name__}")
+        if seg >= len(ref):
+            return True
+        return ref[seg] != value  # may raise IndexError, like the real run
     else:
-        # Final segment is a dict key
-        if not isinstance(ref, dict):
-            ref_type = type(ref).__name__
-            module.fail_json(msg=f"Expected a dict for final segment '{last_seg}', found {ref_type}")
-        ref[last_seg] = value
+        if virtual:
+            return True
+        if not (ref.__class__ is dict or isinstance(ref, dict)):
+            module.fail_json(msg=f"Expected a dict for final segment '{seg}', found {type(ref).__name__}")
+        existing = ref.get(seg, _NOT_FOUND)
+        return existing is _NOT_FOUND or existing != value
+
+
+def build_change_trie(changes, module):
+    """
+    Fold the parsed key paths of 'changes' into a trie. Each node is a dict of
+    segment -> child node; a node that is itself a target stores its original
+    key path and value under the _LEAF sentinel. A key path with no usable
+    segments is an error — a leaf on the root would otherwise be silently
+    skipped by apply_trie.
+    """
+    root = {}
+    for key_path, val in changes.items():
+        segments = parse_key_path(key_path)
+        if not segments:
+            module.fail_json(msg=f"Error applying change for '{key_path}': empty key path")
+        node = root
+        for seg in segments:
+            node = node.setdefault(seg, {})
+        node[_LEAF] = (key_path, val)
+    return root
+
+
+def _first_key_path(node):
+    """
+    Return any original key path found at or beneath 'node', for error messages.
+    """
+    leaf = node.get(_LEAF)
+    if leaf is not None:
+        return leaf[0]
+    for seg, child in node.items():
+        if seg is not _LEAF:
+            found = _first_key_path(child)
+            if found is not None:
+                return found
+    return None
+
+
+def apply_trie(node, ref, module):
+    """
+    Depth-first apply a change trie against container 'ref'. A node that is
+    both a target and a parent (e.g. "a.b" alongside "a.b.c") applies its own
+    value before descending, so shallower assignments still land first.
+    Returns True if anything was modified.
+    """
+    changed = False
+    for seg, child in node.items():
+        if seg is _LEAF:
+            continue
+        leaf = child.get(_LEAF)
+        if leaf is not None:
+            key_path, val = leaf
+            try:
+                if assign_segment(ref, seg, val, module):
+                    changed = True
+            except Exception as e:
+                module.fail_json(msg=f"Error applying change for '{key_path}': {e}")
+        if len(child) > (0 if leaf is None else 1):
+            try:
+                child_ref = descend_segment(ref, seg, module)
+            except Exception as e:
+                module.fail_json(msg=f"Error applying change for '{_first_key_path(child)}': {e}")
+            if apply_trie(child, child_ref, module):
+                changed = True
+    return changed
+
+
+def apply_changes(data, changes, module):
+    """
+    Apply a whole batch of key-path changes to 'data' in a single traversal.
+    Returns True if any change actually modified 'data'.
+
+    The changes are folded into a trie of path segments which is walked
+    depth-first alongside the YAML tree, so a parent prefix shared by K
+    sibling changes at depth D is traversed once — O(D + K) container hops
+    instead of O(K * D).
+    """
+    return apply_trie(build_change_trie(changes, module), data, module)
 
 
 def main():
@@ -211,7 +444,8 @@ def main():
         argument_spec=dict(
             path=dict(type='str', required=True),
             changes=dict(type='dict', required=True),
-            backup=dict(type='bool', required=False, default=False)
+            backup=dict(type='bool', required=False, default=False),
+            preserve_formatting=dict(type='bool', required=False, default=True)
         ),
         supports_check_mode=True
     )
@@ -223,57 +457,134 @@ def main():
     path = module.params['path']
     changes = module.params['changes']
     backup = module.params['backup']
+    preserve_formatting = module.params['preserve_formatting']
 
     # Initialize YAML parser
     try:
-        yaml = YAML()
-        yaml.preserve_quotes = True
-        yaml.explicit_start = False
-        yaml.indent(sequence=4, offset=2)
+        yaml = get_yaml(preserve_formatting)
     except Exception as e:
         module.fail_json(msg=f"Error initializing YAML parser: {e}")
 
     # Load or initialize data
-    original_data = {}
-    if os.path.exists(path):
+    data = {}
+    stat_sig = None
+    noop_key = None
+    exists = os.path.exists(path)
+    if exists:
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                loaded_data = yaml.load(f)
+            # Validate cache entries against mtime+size so a file changed on
+            # disk by someone else is re-read.
+            st = os.stat(path)
+            stat_sig = (st.st_mtime_ns, st.st_size, preserve_formatting)
+            noop_key = (stat_sig, repr(sorted(changes.items())))
+            if noop_key in _NOOP_CACHE.get(path, ()):
+                # This exact file state with these exact changes was already a
+                # no-op; skip the parse altogether.
+                module.exit_json(changed=False, msg="No changes were required.")
+            entry = _PARSE_CACHE.get(path)
+            if entry is not None and entry[0] == stat_sig:
+                cached = entry[1]
+                # Hand out a copy so in-place edits below never touch the
+                # cache; check mode is read-only and can use it directly.
+                data = cached if module.check_mode else clone_tree(cached)
+            else:
+                # Slurp the file in one bulk read and hand ruamel the bytes
+                # (it decodes UTF-8 itself); the scanner then works from
+                # memory instead of pulling small chunks through the stream
+                # layer with a syscall each.
+                with open(path, 'rb', buffering=0) as f:
+                    loaded_data = yaml.load(f.read())
                 if loaded_data is None:
                     loaded_data = {}
-                original_data = loaded_data
+                data = loaded_data
+                if module.check_mode:
+                    # Check mode never mutates, so the fresh tree is safe to
+                    # cache right away. Real runs mutate 'data' in place and a
+                    # failed batch could leave it half-edited, so they only
+                    # cache once the batch is known to be a no-op (below).
+                    _PARSE_CACHE[path] = (stat_sig, data)
         except Exception as e:
             module.fail_json(msg=f"Failed to parse YAML file '{path}': {e}")
     else:
         # If file doesn't exist, start with an empty dict
-        original_data = {}
-
-    updated_data = copy.deepcopy(original_data)
-
-    # Apply changes
-    for key_path, val in changes.items():
-        try:
-            set_nested_value(updated_data, key_path, val, module)
-        except Exception as e:
-            module.fail_json(msg=f"Error applying change for '{key_path}': {e}")
-
-    # Compare old vs. new
-    if updated_data != original_data:
-        # Something changed
-        if module.check_mode:
-            module.exit_json(changed=True, msg="Changes would have been made (check mode).")
+        data = {}
+
+    # In check mode, never build or mutate anything: dry-run each change
+    # read-only, short-circuiting on the first one that would modify the tree
+    # and failing on the same inputs the real apply path rejects.
+    if module.check_mode:
+        for key_path, val in changes.items():
+            segments = parse_key_path(key_path)
+            if not segments:
+                # Same validation as build_change_trie, so check and real
+                # runs agree on bad input.
+                module.fail_json(msg=f"Error applying change for '{key_path}': empty key path")
+            try:
+                differs = would_change(data, segments, val, module)
+            except Exception as e:
+                module.fail_json(msg=f"Error applying change for '{key_path}': {e}")
+            if differs:
+                module.exit_json(changed=True, msg="Changes would have been made (check mode).")
+        if noop_key is not None:
+            _NOOP_CACHE.setdefault(path, set()).add(noop_key)
+        module.exit_json(changed=False, msg="No changes were required.")
 
+    # Apply changes in place as one batch; 'changed' tracks whether any
+    # assignment actually modified the tree, so no before/after copy or
+    # deep comparison is needed.
+    changed = apply_changes(data, changes, module)
+
+    if not changed:
+        if stat_sig is not None:
+            entry = _PARSE_CACHE.get(path)
+            if entry is None or entry[0] != stat_sig:
+                # The whole batch was a no-op, so the tree is untouched and
+                # now safe to cache for later invocations.
+                _PARSE_CACHE[path] = (stat_sig, data)
+        if noop_key is not None:
+            # Remember the fingerprint so an identical rerun against the
+            # unmodified file exits before parsing.
+            _NOOP_CACHE.setdefault(path, set()).add(noop_key)
+
+    if changed:
         # Backup if requested
-        if backup and os.path.exists(path):
+        if backup and exists:
             module.backup_local(path)
 
-        # Write updated data
+        # Write updated data: serialize fully in memory, then publish with a
+        # single write, fsync, and atomic rename — one payload syscall instead
+        # of many small dump writes, and readers never see a partial file.
+        # mkstemp gives a unique 0600 file in the destination directory, so
+        # concurrent plays never race on a shared temp name and the payload is
+        # never exposed more widely than the destination; atomic_move then
+        # carries over the destination's permissions, ownership, and SELinux
+        # context (or applies umask defaults for a new file).
+        tmp_path = None
         try:
-            with open(path, 'w', encoding='utf-8') as f:
-                yaml.dump(updated_data, f)
+            buf = io.StringIO()
+            yaml.dump(data, buf)
+            payload = buf.getvalue().encode('utf-8')
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+            try:
+                os.write(fd, payload)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            module.atomic_move(tmp_path, path)
         except Exception as e:
+            if tmp_path is not None:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
             module.fail_json(msg=f"Failed to write updates to '{path}': {e}")
 
+        # Our own write may keep the file's size and land within the same
+        # mtime clock tick, so stale entries cannot be detected by stat;
+        # drop the path's cached tree and no-op fingerprints unconditionally.
+        _PARSE_CACHE.pop(path, None)
+        _NOOP_CACHE.pop(path, None)
+
         module.exit_json(changed=True, msg=f"File '{path}' updated successfully.")
     else:
         # No changes needed